@@ -24,6 +24,8 @@ def main():
     uvicorn.run('vo.app:app',
                 host=settings.server_host,
                 port=settings.server_port,
+                # Крупные broadcast-сообщения сжимаются один раз на стороне приложения
+                ws_per_message_deflate=False,
                 reload=True)
 
 if __name__ == "__main__":
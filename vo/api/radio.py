@@ -1,11 +1,9 @@
 import logging
-from datetime import datetime
 from typing import Dict, List, Optional
-from sqlalchemy.orm import Session
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Depends, Query, Body
 
-from vo.database import get_session
+from vo.clock import now_iso
 from vo.model.auth import User
 from vo.model.message_type import MessageType
 from vo.service.auth import get_current_user
@@ -23,19 +21,9 @@ logger = logging.getLogger(__name__)
 radio_manager = RadioConnectionManager()
 
 
-def get_radio_manager_with_session():
-    """Фабрика для получения менеджера с установленной сессией"""
-
-    def _get_manager(session: Session = Depends(get_session)):
-        # Устанавливаем сессию БД в менеджер
-        radio_manager.set_session(session)
-        return radio_manager
-
-    return _get_manager
-
-
-# Используем эту фабрику в зависимостях
-get_radio_manager = get_radio_manager_with_session()
+def get_radio_manager() -> RadioConnectionManager:
+    """Общий менеджер рации (сессии БД он открывает сам)"""
+    return radio_manager
 
 
 # ========== WebSocket endpoints ==========
@@ -60,6 +48,9 @@ async def websocket_radio(
         while True:
             # Ожидаем данные от клиента
             data = await websocket.receive()
+            if data["type"] == "websocket.disconnect":
+                # Сокет закрыт (в том числе сервером при отключении не успевающего клиента)
+                raise WebSocketDisconnect(data.get("code", 1000))
 
             if "text" in data:
                 # Обработка текстовых команд
@@ -203,7 +194,7 @@ async def _handle_client_message(
         # Keep-alive ping
         await radio_manager._send_to_user(channel_id, user_id, {
             "type": MessageType.PONG,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso()
         })
 
     else:
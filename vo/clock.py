@@ -0,0 +1,19 @@
+import time
+from datetime import datetime
+
+# Точность временных меток в сообщениях рации (сек)
+NOW_ISO_RESOLUTION = 0.05
+
+
+class _Now:
+    ts = ""
+    mono = float("-inf")
+
+
+def now_iso() -> str:
+    """Текущее время в ISO-формате, кешируется на NOW_ISO_RESOLUTION секунд"""
+    mono = time.monotonic()
+    if mono - _Now.mono > NOW_ISO_RESOLUTION:
+        _Now.mono = mono
+        _Now.ts = datetime.now().isoformat()
+    return _Now.ts
@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from .settings import settings
 from sqlalchemy import event
@@ -8,6 +9,11 @@ engine = create_engine(settings.database_url, connect_args={'check_same_thread':
 
 Session = sessionmaker(engine, autocommit=False, autoflush=False)
 
+# Асинхронный движок для кода, работающего прямо в event loop (рация)
+async_engine = create_async_engine(settings.async_database_url)
+
+async_session = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 def get_session() -> Session:
     session = Session()
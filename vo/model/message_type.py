@@ -3,6 +3,7 @@ from enum import Enum
 
 class MessageType(str, Enum):
     CONNECTED = "connected"
+    INIT = "init"
     USER_JOINED = "user_joined"
     USER_LEFT = "user_left"
     SPEAKER_CHANGED = "speaker_changed"
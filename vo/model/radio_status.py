@@ -5,6 +5,10 @@ from typing import Optional, List
 
 @dataclass
 class RadioStatus:
+    # Без __dict__ у каждого экземпляра (slots=True в dataclass есть только с Python 3.10)
+    __slots__ = ("channel_id", "current_speaker", "current_speaker_name", "waiting_queue", "waiting_names",
+                 "connected_users", "connected_usernames", "total_connected", "server_time")
+
     channel_id: Optional[int]
     current_speaker: Optional[str]
     current_speaker_name: Optional[str]
@@ -1,12 +1,22 @@
-from dataclasses import dataclass
+import asyncio
+from typing import Optional
+
 from fastapi import WebSocket
 from datetime import datetime
 
 
-@dataclass
 class User:
-    id: str
-    username: str
-    websocket: WebSocket
-    connected_at: datetime
-    is_speaking: bool = False
\ No newline at end of file
+    # Объект живет всё время соединения и читается на каждом аудио-пакете,
+    # поэтому без __dict__ (dataclass(slots=True) недоступен в Python 3.9)
+    __slots__ = ("id", "username", "websocket", "connected_at", "is_speaking", "out_queue", "writer")
+
+    def __init__(self, id: str, username: str, websocket: WebSocket, connected_at: datetime,
+                 is_speaking: bool = False,
+                 out_queue: Optional[asyncio.Queue] = None, writer: Optional[asyncio.Task] = None):
+        self.id = id
+        self.username = username
+        self.websocket = websocket
+        self.connected_at = connected_at
+        self.is_speaking = is_speaking
+        self.out_queue = out_queue
+        self.writer = writer
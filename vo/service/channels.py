@@ -1,9 +1,11 @@
 import logging
 import random
-from typing import List, cast
+from collections import defaultdict
+from typing import Dict, List, cast
 
 from fastapi import Depends, HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import exists, select
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
 
 from vo import tables, constants
@@ -39,19 +41,25 @@ class ChannelsService:
         new_channel = tables.Channel(name=channel_data.name, channel_code=generate_channel_code())
         '''The probability that the code is already occupied is extremely small, 
         but if this happens, we generate a new code'''
-        if self.get_channel_by_code(new_channel.channel_code):
+        if self.channel_code_exists(new_channel.channel_code):
             new_channel.channel_code = generate_channel_code()
-        self.session.add(new_channel)
-        self.session.commit()
-
-        participant = tables.Participants(
-            user_id=user_id,
-            channel_id=new_channel.id,
-            is_moderator=True,
-            is_owner=True
-        )
-        self.session.add(participant)
-        self.session.commit()
+        try:
+            self.session.add(new_channel)
+            # flush заполняет new_channel.id без отдельного коммита
+            self.session.flush()
+
+            participant = tables.Participants(
+                user_id=user_id,
+                channel_id=new_channel.id,
+                is_moderator=True,
+                is_owner=True
+            )
+            self.session.add(participant)
+            # Канал и владелец сохраняются одной транзакцией
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
         logger.info(f"Created channel: {new_channel.id}")
         channel = Channel(name=new_channel.name, id=new_channel.id, channel_code=new_channel.channel_code,
                           participants=self.get_participants(new_channel.id), black_list=[])
@@ -75,10 +83,13 @@ class ChannelsService:
             tables.Channel.id == tables.Participants.channel_id,
             tables.Participants.user_id == user_id
         ).all()
+        channel_ids = [channel.id for channel in channels]
+        # Участники и черные списки всех каналов - одним запросом каждый, а не по запросу на канал
+        participants = self.get_participants_by_channels(channel_ids)
+        black_lists = self.get_black_lists_by_channels(channel_ids)
         for channel in channels:
-            logger.info(f"Error deleting channel: {channel}")
-            channel.participants = self.get_participants(channel.id)
-            channel.black_list = await self.get_black_list(channel.id)
+            channel.participants = participants.get(channel.id, [])
+            channel.black_list = black_lists.get(channel.id, [])
         return channels
 
     async def join(self, user_id: int, channel_code: str) -> Channel:
@@ -86,10 +97,15 @@ class ChannelsService:
         if not course:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
         channel_id = course.id
-        if user_id in self.get_participants_ids(channel_id):
-            raise HTTPException(status_code=418, detail="You have already joined the channel")
         participants = Participants(user_id=user_id, channel_id=channel_id)
-        self.session.add(tables.Participants(**participants.dict()))
+        # Повторное вступление отсекает первичный ключ (user_id, channel_id) - без предварительной выборки
+        result = self.session.execute(
+            insert(tables.Participants).values(**participants.dict()).on_conflict_do_nothing(
+                index_elements=[tables.Participants.user_id, tables.Participants.channel_id]
+            )
+        )
+        if not result.rowcount:
+            raise HTTPException(status_code=418, detail="You have already joined the channel")
         self.session.commit()
         return await self._get(user_id, channel_id)
 
@@ -110,13 +126,36 @@ class ChannelsService:
 
         return result
 
+    def get_participants_by_channels(self, channel_ids: List[int]) -> Dict[int, List[ChannelUsers]]:
+        users = self.session.query(
+            tables.Participants.channel_id, tables.User.phone, tables.User.username, tables.Participants.user_id,
+            tables.Participants.is_moderator, tables.Participants.is_owner
+        ).select_from(tables.User).join(tables.Participants).filter(
+            tables.Participants.channel_id.in_(channel_ids)
+        ).all()
+
+        result = defaultdict(list)
+        for user in users:
+            user_dict = user._asdict()
+            channel_id = user_dict.pop('channel_id')
+            result[channel_id].append(ChannelUsers(**user_dict))
+
+        return result
+
+    def get_black_lists_by_channels(self, channel_ids: List[int]) -> Dict[int, List[tables.BlackList]]:
+        statement = select(tables.BlackList).filter(tables.BlackList.channel_id.in_(channel_ids))
+        result = defaultdict(list)
+        for item in self.session.execute(statement).scalars():
+            result[item.channel_id].append(item)
+        return result
+
     def get_channel_by_code(self, channel_code: str) -> tables.Channel:
         statement = select(tables.Channel).filter_by(channel_code=channel_code)
         return self.session.execute(statement).scalars().first()
 
-    def get_participants_ids(self, channel_id: int) -> List[int]:
-        statement = select(tables.Participants.user_id).filter_by(channel_id=channel_id)
-        return self.session.execute(statement).scalars().all()
+    def channel_code_exists(self, channel_code: str) -> bool:
+        statement = select(exists().where(tables.Channel.channel_code == channel_code))
+        return self.session.execute(statement).scalar()
 
     async def _get(self, user_id: int, channel_id: int) -> Channel:
         channel = self.session.query(tables.Channel).join(tables.Participants).filter(
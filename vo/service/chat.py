@@ -1,4 +1,6 @@
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Optional
 import pytz
@@ -17,6 +19,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Синхронные запросы к БД выполняются в пуле потоков, чтобы не блокировать event loop
+DB_EXECUTOR_WORKERS = 8
+_db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS)
+
 
 class ChatService:
     def __init__(self, session: Session = Depends(get_session)):
@@ -26,6 +32,10 @@ class ChatService:
         """
         Получение сообщений с учетом часового пояса
         """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_db_executor, self._get_messages, channel_id, timezone_str)
+
+    def _get_messages(self, channel_id: int, timezone_str: str) -> dict:
         statement = select(tables.ChatMessage).filter_by(channel_id=channel_id)
         db_messages = self.session.execute(statement).scalars().all()
         messages = []
@@ -87,9 +97,13 @@ class ChatService:
             image_url=base_message.image_url,
             time=current_time.strftime('%d.%m.%Y %H:%M')
         )
-        self.session.add(new_message)
-        self.session.commit()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_db_executor, self._save_message, new_message)
         logger.info(f"Message saved successfully")
 
         # Возвращаем обновленный список сообщений с учетом часового пояса
-        return await self.get_messages(base_message.channel_id, timezone_str)
\ No newline at end of file
+        return await self.get_messages(base_message.channel_id, timezone_str)
+
+    def _save_message(self, new_message: tables.ChatMessage):
+        self.session.add(new_message)
+        self.session.commit()
@@ -1,19 +1,25 @@
 import asyncio
+import base64
 import json
 import logging
-import uuid
-from collections import defaultdict
+import secrets
+import zlib
 from datetime import datetime
-from typing import Dict, Optional, List
+from typing import Deque, Dict, Optional, List, Set, Tuple
 
 from fastapi import WebSocket
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert
 
+from vo.clock import now_iso
+from vo.database import async_session
 from vo.model.message_type import MessageType
 from vo.model.radio_status import RadioStatus
 from vo.model.user import User
-from .. import tables
 from ..tables import Channel, User as DBUser, Participants
 from .radio_recorder import RadioRecorder
 from datetime import date
@@ -24,67 +30,104 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Максимум кадров в очереди отправки одного пользователя
+SEND_QUEUE_SIZE = 128
+# Типы кадров в очереди отправки: (тип, данные)
+FRAME_TEXT = "text"
+FRAME_BYTES = "bytes"
+# 1KB тишины: подготовительные пакеты для инициализации аудио системы клиента
+SILENT_PACKET = bytes(1024)
+SILENT_FRAME = (FRAME_BYTES, SILENT_PACKET)
+# Broadcast-сообщения длиннее этого порога (байт) сжимаются один раз для всех получателей
+BROADCAST_COMPRESS_THRESHOLD = 1024
+# Окно склейки аудио чанков говорящего в один кадр (секунды)
+AUDIO_COALESCE_WINDOW = 0.02
+# Сколько ждать отправки одного кадра, прежде чем считать клиента зависшим (секунды)
+SEND_TIMEOUT = 5.0
+
+
+def _json_default(value):
+    """datetime/date в ISO-формате - так же, как их сериализует orjson"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(message: Dict) -> str:
+    """Компактная сериализация сообщения: orjson, если установлен, иначе стандартный json"""
+    if orjson is not None:
+        return orjson.dumps(message).decode("utf-8")
+    return json.dumps(message, separators=(",", ":"), default=_json_default)
+
+
+def _encode_broadcast(message: Dict) -> str:
+    """Сериализация broadcast-сообщения; крупные сообщения упаковываются в {"z": <base64(zlib)>}"""
+    json_message = _dumps(message)
+    if len(json_message) <= BROADCAST_COMPRESS_THRESHOLD:
+        return json_message
+    compressed = zlib.compress(json_message.encode("utf-8"), 1)
+    return _dumps({"z": base64.b64encode(compressed).decode("ascii")})
+
 
 class RadioConnectionManager:
     def __init__(self):
         # Храним активные соединения по каналам: channel_id -> {user_id: User}
-        self.active_channels: Dict[int, Dict[str, User]] = defaultdict(dict)
-        self.current_speakers: Dict[int, Optional[str]] = defaultdict(lambda: None)
-        self.waiting_queues: Dict[int, List[str]] = defaultdict(list)
-        self._lock = asyncio.Lock()
-        self._db_lock = asyncio.Lock()
+        self.active_channels: Dict[int, Dict[str, User]] = {}
+        # Обычные dict: чтение через .get() не создает пустых записей для каналов
+        self.current_speakers: Dict[int, Optional[str]] = {}
+        self.waiting_queues: Dict[int, Deque[str]] = {}
+        # Те же id, что в waiting_queues - для проверки членства за O(1)
+        self.waiting_sets: Dict[int, Set[str]] = {}
+        # Слушатели канала (все, кроме говорящего) - готовый список для рассылки аудио
+        self.listeners: Dict[int, List[User]] = {}
+        # Аудио, накопленное за текущее окно склейки, и таймер его отправки
+        self._audio_buffers: Dict[int, bytearray] = {}
+        self._audio_flush_handles: Dict[int, asyncio.TimerHandle] = {}
+        # Запуск и остановка записи ждут файловых операций - выполняем их по очереди
+        self._recording_lock = asyncio.Lock()
+        # Пользователи, для которых уже запланировано отключение
+        self._pending_disconnect: Set[str] = set()
+        # Готовый статус канала для отправки; сбрасывается при любом изменении состояния канала
+        self._status_cache: Dict[int, Dict] = {}
         self.recorder = RadioRecorder(records_dir="records")
 
-    def set_session(self, session: Session):
-        """Устанавливаем сессию БД (вызывается при каждом запросе)"""
-        self.session = session
-
     # ========== Основные методы для подключения пользователей ==========
 
     async def _validate_channel_access(self, channel_id: int, username: str) -> bool:
         """Проверка доступа пользователя к каналу в БД"""
-        async with self._db_lock:
+        async with async_session() as session:
             # Проверяем существование канала
-            channel = self.session.query(Channel).filter(Channel.id == channel_id).first()
-            if not channel:
+            if await session.get(Channel, channel_id) is None:
                 logger.error(f"❌ Канал {channel_id} не найден в БД")
                 return False
 
-            # Находим пользователя по username
-            user = self.session.query(DBUser).filter(DBUser.username == username).first()
-            if not user:
-                # Если пользователя нет, создаем его
-                try:
+            try:
+                # Находим пользователя по username
+                user = (await session.execute(select(DBUser).where(DBUser.username == username))).scalars().first()
+                if not user:
+                    # Если пользователя нет, создаем его (id нужен для участника ниже)
                     user = DBUser(username=username)
-                    self.session.add(user)
-                    self.session.commit()
-                    self.session.refresh(user)
+                    session.add(user)
+                    await session.flush()
                     logger.info(f"✅ Создан новый пользователь: {username} (ID: {user.id})")
-                except Exception as e:
-                    logger.error(f"❌ Ошибка создания пользователя: {e}")
-                    return False
-
-            # Проверяем участника канала
-            participant = self.session.query(Participants).filter(
-                Participants.user_id == user.id,
-                Participants.channel_id == channel_id
-            ).first()
-
-            if not participant:
-                # Автоматически добавляем как участника (без прав)
-                try:
-                    participant = Participants(
+
+                # Автоматически добавляем как участника (без прав), если его ещё нет
+                result = await session.execute(
+                    insert(Participants).values(
                         user_id=user.id,
                         channel_id=channel_id,
                         is_moderator=False,
                         is_owner=False
-                    )
-                    self.session.add(participant)
-                    self.session.commit()
+                    ).on_conflict_do_nothing(index_elements=[Participants.user_id, Participants.channel_id])
+                )
+                # Пользователь и участник сохраняются одной транзакцией
+                await session.commit()
+                if result.rowcount:
                     logger.info(f"✅ Пользователь {username} добавлен в канал {channel_id}")
-                except Exception as e:
-                    logger.error(f"❌ Ошибка добавления участника: {e}")
-                    return False
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"❌ Ошибка добавления участника: {e}")
+                return False
 
             return True
 
@@ -97,183 +140,291 @@ class RadioConnectionManager:
         await websocket.accept()
 
         # Генерируем уникальный ID для WebSocket соединения
-        ws_user_id = f"{username}_{uuid.uuid4().hex[:8]}"
+        ws_user_id = f"{username}_{secrets.token_hex(4)}"
 
         # Создаем объект пользователя для WebSocket
         user = User(
             id=ws_user_id,
             username=username,
             websocket=websocket,
-            connected_at=datetime.now()
+            connected_at=datetime.now(),
+            out_queue=asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
         )
+        user.writer = asyncio.create_task(self._writer(channel_id, user))
 
-        async with self._lock:
-            self.active_channels[channel_id][ws_user_id] = user
+        self._mutate_add_user(channel_id, user)
 
         logger.info(f"🟢 ПОДКЛЮЧЕНИЕ: {username} ({ws_user_id}) к каналу {channel_id}")
 
-        # Отправляем подтверждение подключения
-        await self._send_to_user(channel_id, ws_user_id, {
-            "type": MessageType.CONNECTED,
-            "user_id": ws_user_id,
-            "username": username,
-            "channel_id": channel_id,
-            "message": f"Connected to channel {channel_id}",
-            "server_time": datetime.now().isoformat()
-        })
+        await self._notify_join(channel_id, user)
 
-        # Отправляем текущий статус канала
-        await self._send_status_to_user(channel_id, ws_user_id)
+        return ws_user_id
 
-        await self._send_recording_status_to_user(channel_id, ws_user_id)
+    async def _notify_join(self, channel_id: int, user: User):
+        """Уведомления о подключении: самому пользователю и остальным в канале"""
+        now = now_iso()
+
+        # Подтверждение подключения, статус канала и статус записи - одним сообщением
+        status = await self._get_status_payload(channel_id)
+        await self._send_to_user(channel_id, user.id, {
+            "type": MessageType.INIT,
+            "connected": {
+                "user_id": user.id,
+                "username": user.username,
+                "channel_id": channel_id,
+                "message": f"Connected to channel {channel_id}",
+                "server_time": now
+            },
+            "status": status,
+            "recording_status": self.recorder.get_recording_status(channel_id)
+        })
+
+        # Отправляем 3 "тихих" пакета для инициализации аудио системы - один раз при подключении,
+        # чтобы трансляция аудио была простой отправкой пакета
+        for _ in range(3):
+            user.out_queue.put_nowait(SILENT_FRAME)
 
         # Уведомляем всех в канале о новом пользователе
-        await self._broadcast_excluding(channel_id, ws_user_id, {
+        await self._broadcast_excluding(channel_id, user.id, {
             "type": MessageType.USER_JOINED,
-            "user_id": ws_user_id,
-            "username": username,
+            "user_id": user.id,
+            "username": user.username,
             "channel_id": channel_id,
-            "total_users": len(self.active_channels[channel_id]),
-            "timestamp": datetime.now().isoformat()
+            "total_users": self._channel_size(channel_id),
+            "timestamp": now
         })
 
-        return ws_user_id
-
     async def disconnect_user(self, ws_user_id: str, channel_id: int):
         """Отключение пользователя от канала"""
-        async with self._lock:
-            if channel_id not in self.active_channels or ws_user_id not in self.active_channels[channel_id]:
-                return
+        if channel_id not in self.active_channels or ws_user_id not in self.active_channels[channel_id]:
+            return
 
-            user = self.active_channels[channel_id][ws_user_id]
-            username = user.username
+        # Изменения состояния - без await, поэтому атомарны в рамках event loop
+        next_speaker_id = None
+        was_speaker = self.current_speakers.get(channel_id) == ws_user_id
+        if was_speaker:
+            # Если это текущий говорящий - освобождаем
+            next_speaker_id = self._mutate_release_speaker(channel_id, ws_user_id)
+        user = self._mutate_remove_user(channel_id, ws_user_id)
 
-            # Удаляем из очереди ожидания
-            if ws_user_id in self.waiting_queues[channel_id]:
-                self.waiting_queues[channel_id].remove(ws_user_id)
+        logger.info(f"🔴 ОТКЛЮЧЕНИЕ: {user.username} ({ws_user_id}) от канала {channel_id}")
 
-            # Если это текущий говорящий - освобождаем
-            if self.current_speakers[channel_id] == ws_user_id:
-                self.current_speakers[channel_id] = None
-                await self._handle_speaker_released(channel_id, ws_user_id, "disconnected")
+        if was_speaker:
+            await self._notify_speaker_released(channel_id, user.username, "disconnected", next_speaker_id)
 
-            # Удаляем пользователя
-            del self.active_channels[channel_id][ws_user_id]
+        # Уведомляем всех в канале об отключении
+        await self._broadcast_to_channel(channel_id, {
+            "type": MessageType.USER_LEFT,
+            "user_id": ws_user_id,
+            "username": user.username,
+            "channel_id": channel_id,
+            "total_users": self._channel_size(channel_id),
+            "timestamp": now_iso()
+        })
 
-            # Если канал пустой - очищаем
-            if not self.active_channels[channel_id]:
-                if channel_id in self.active_channels:
-                    del self.active_channels[channel_id]
-                if channel_id in self.current_speakers:
-                    del self.current_speakers[channel_id]
-                if channel_id in self.waiting_queues:
-                    del self.waiting_queues[channel_id]
+    def _mutate_add_user(self, channel_id: int, user: User):
+        """Добавление пользователя в состояние канала"""
+        self.active_channels.setdefault(channel_id, {})[user.id] = user
+        self._rebuild_listeners(channel_id)
+
+    def _channel_size(self, channel_id: int) -> int:
+        """Количество пользователей в канале без создания пустого словаря"""
+        users = self.active_channels.get(channel_id)
+        return len(users) if users else 0
+
+    def _mutate_remove_user(self, channel_id: int, ws_user_id: str) -> User:
+        """Удаление пользователя из состояния канала"""
+        user = self.active_channels[channel_id].pop(ws_user_id)
+
+        # Останавливаем задачу отправки
+        if user.writer:
+            user.writer.cancel()
+
+        # Удаляем из очереди ожидания
+        self._remove_from_waiting(channel_id, ws_user_id)
+
+        # Если канал пустой - очищаем
+        if not self.active_channels[channel_id]:
+            del self.active_channels[channel_id]
+            if channel_id in self.current_speakers:
+                del self.current_speakers[channel_id]
+            if channel_id in self.waiting_queues:
+                del self.waiting_queues[channel_id]
+            if channel_id in self.waiting_sets:
+                del self.waiting_sets[channel_id]
+
+        self._rebuild_listeners(channel_id)
+        return user
+
+    async def get_owner_premium(self, channel_id: int) -> Optional[date]:
+        """Дата окончания премиума владельца канала (владелец и пользователь - одним запросом)"""
+        statement = select(DBUser.premium).join(Participants, Participants.user_id == DBUser.id).filter(
+            Participants.channel_id == channel_id,
+            Participants.is_owner == True
+        )
+        async with async_session() as session:
+            return (await session.execute(statement)).scalars().first()
 
-            logger.info(f"🔴 ОТКЛЮЧЕНИЕ: {username} ({ws_user_id}) от канала {channel_id}")
+    async def request_speak(self, ws_user_id: str, channel_id: int, speaker_name: str) -> Dict:
+        """Запрос на право говорить в канале"""
+        now = now_iso()
 
-            # Уведомляем всех в канале об отключении
-            await self._broadcast_to_channel(channel_id, {
-                "type": MessageType.USER_LEFT,
-                "user_id": ws_user_id,
-                "username": username,
+        if channel_id not in self.active_channels or ws_user_id not in self.active_channels[channel_id]:
+            return {
+                "type": MessageType.ERROR,
+                "message": "User not connected"
+            }
+
+        # Если кто-то говорит - отказываем
+        current_speaker = self.current_speakers.get(channel_id)
+        if current_speaker is not None:
+            return {
+                "type": MessageType.SPEAK_DENIED,
+                "current_speaker": self.active_channels[channel_id][current_speaker].username,
                 "channel_id": channel_id,
-                "total_users": len(self.active_channels.get(channel_id, {})),
-                "timestamp": datetime.now().isoformat()
-            })
+                "timestamp": now
+            }
 
-    async def get_channel_owner(self, channel_id: int) -> tables.Participants:
-        statement = select(tables.Participants).filter_by(channel_id=channel_id, is_owner=True)
-        return self.session.execute(statement).scalars().first()
+        # Никто не говорит - даем право (до первого await, поэтому без гонок)
+        self.current_speakers[channel_id] = ws_user_id
+        self.active_channels[channel_id][ws_user_id].is_speaking = True
+        self._rebuild_listeners(channel_id)
 
-    async def get_user(self, user_id: int) -> tables.User:
-        statement = select(tables.User).filter_by(id=user_id)
-        return self.session.execute(statement).scalars().first()
+        username = self.active_channels[channel_id][ws_user_id].username
+        logger.info(f"🎤 НАЧАЛ ГОВОРИТЬ в канале {channel_id}: {username}")
+        premium = await self.get_owner_premium(channel_id)
+        logger.info(f"Премиум {premium}: {date.today()}")
+        # Пока ждали БД, пользователь мог отключиться или отпустить кнопку
+        if self.current_speakers.get(channel_id) != ws_user_id:
+            return self._speak_lost(channel_id, now)
 
-    async def request_speak(self, ws_user_id: str, channel_id: int, speaker_name: str) -> Dict:
-        """Запрос на право говорить в канале"""
-        async with self._lock:
-            if channel_id not in self.active_channels or ws_user_id not in self.active_channels[channel_id]:
-                return {
-                    "type": MessageType.ERROR,
-                    "message": "User not connected"
-                }
-
-            # Если никто не говорит - даем право
-            if self.current_speakers[channel_id] is None:
-                self.current_speakers[channel_id] = ws_user_id
-                self.active_channels[channel_id][ws_user_id].is_speaking = True
-
-                username = self.active_channels[channel_id][ws_user_id].username
-                logger.info(f"🎤 НАЧАЛ ГОВОРИТЬ в канале {channel_id}: {username}")
-                owner = await self.get_channel_owner(channel_id)
-                user = await self.get_user(owner.user_id)
-                logger.info(f"Премиум {user.premium}: {date.today()}")
-                logger.info(f"Дата {user.premium >= date.today():}")
-                if user.premium >= date.today():
-                    await self.start_recording(channel_id, speaker_name)
-
-                # Уведомляем всех в канале
-                await self._broadcast_to_channel(channel_id, {
-                    "type": MessageType.SPEAKER_CHANGED,
-                    "speaker_id": ws_user_id,
-                    "speaker_name": username,
-                    "channel_id": channel_id,
-                    "timestamp": datetime.now().isoformat()
-                })
-
-                return {
-                    "type": MessageType.SPEAK_GRANTED,
-                    "message": "You can speak now",
-                    "channel_id": channel_id,
-                    "timestamp": datetime.now().isoformat()
-                }
+        if premium and premium >= date.today():
+            result = await self.start_recording(channel_id, speaker_name)
+            if self.current_speakers.get(channel_id) != ws_user_id:
+                # Право потеряно во время старта записи - останавливаем начатую нами запись
+                if result["success"]:
+                    await self.stop_recording(channel_id)
+                return self._speak_lost(channel_id, now)
 
-            else:
-                return {
-                    "type": MessageType.SPEAK_DENIED,
-                    "current_speaker": self.active_channels[channel_id][self.current_speakers[channel_id]].username,
-                    "channel_id": channel_id,
-                    "timestamp": datetime.now().isoformat()
-                }
+        # Уведомляем всех в канале
+        await self._broadcast_to_channel(channel_id, {
+            "type": MessageType.SPEAKER_CHANGED,
+            "speaker_id": ws_user_id,
+            "speaker_name": username,
+            "channel_id": channel_id,
+            "timestamp": now
+        })
+
+        return {
+            "type": MessageType.SPEAK_GRANTED,
+            "message": "You can speak now",
+            "channel_id": channel_id,
+            "timestamp": now
+        }
+
+    def _speak_lost(self, channel_id: int, now: str) -> Dict:
+        """Ответ на запрос права говорить, если право освободилось до завершения выдачи"""
+        return {
+            "type": MessageType.SPEAK_RELEASED,
+            "message": "Speaking rights released",
+            "channel_id": channel_id,
+            "timestamp": now
+        }
 
     async def release_speak(self, ws_user_id: str, channel_id: int) -> Dict:
         """Освобождение права говорить в канале"""
-        async with self._lock:
-            # ВСЕГДА удаляем из очереди, где бы пользователь ни был
-            if ws_user_id in self.waiting_queues[channel_id]:
-                self.waiting_queues[channel_id].remove(ws_user_id)
-                logger.info(f"🗑️ Удален из очереди: {ws_user_id}")
-
-            if self.current_speakers[channel_id] != ws_user_id:
-                return {
-                    "type": MessageType.SPEAK_RELEASED,
-                    "message": "Removed from queue",
-                    "channel_id": channel_id,
-                    "timestamp": datetime.now().isoformat()
-                }
-
-            # Освобождаем право
-            self.current_speakers[channel_id] = None
-            self.active_channels[channel_id][ws_user_id].is_speaking = False
-
-            await self.stop_recording(channel_id)
-            await self._handle_speaker_released(channel_id, ws_user_id, "released")
+        now = now_iso()
 
+        # ВСЕГДА удаляем из очереди, где бы пользователь ни был
+        if self._remove_from_waiting(channel_id, ws_user_id):
+            logger.info(f"🗑️ Удален из очереди: {ws_user_id}")
+
+        if self.current_speakers.get(channel_id) != ws_user_id:
             return {
                 "type": MessageType.SPEAK_RELEASED,
-                "message": "Speaking rights released",
+                "message": "Removed from queue",
                 "channel_id": channel_id,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": now
             }
 
-    async def _handle_speaker_released(self, channel_id: int, old_speaker_id: str, reason: str):
-        """Обработка освобождения права говорить"""
-        if channel_id not in self.active_channels or old_speaker_id not in self.active_channels[channel_id]:
+        # Освобождаем право
+        speaker_name = self.active_channels[channel_id][ws_user_id].username
+        next_speaker_id = self._mutate_release_speaker(channel_id, ws_user_id)
+
+        await self.stop_recording(channel_id)
+        await self._notify_speaker_released(channel_id, speaker_name, "released", next_speaker_id)
+
+        return {
+            "type": MessageType.SPEAK_RELEASED,
+            "message": "Speaking rights released",
+            "channel_id": channel_id,
+            "timestamp": now
+        }
+
+    def _mutate_release_speaker(self, channel_id: int, old_speaker_id: str) -> Optional[str]:
+        """Освобождение права говорить и передача его следующему в очереди; возвращает нового говорящего"""
+        # Досылаем накопленное аудио прежним слушателям
+        self._flush_audio(channel_id)
+        self.current_speakers[channel_id] = None
+        self.active_channels[channel_id][old_speaker_id].is_speaking = False
+
+        # Даем право следующему в очереди
+        next_speaker_id = self._pop_next_speaker(channel_id, old_speaker_id)
+        if next_speaker_id:
+            self.current_speakers[channel_id] = next_speaker_id
+            self.active_channels[channel_id][next_speaker_id].is_speaking = True
+            logger.info(f"➡️ ТЕПЕРЬ ГОВОРИТ в канале {channel_id}: "
+                        f"{self.active_channels[channel_id][next_speaker_id].username}")
+
+        self._rebuild_listeners(channel_id)
+        return next_speaker_id
+
+    def _pop_next_speaker(self, channel_id: int, old_speaker_id: str) -> Optional[str]:
+        """Следующий говорящий из очереди ожидания"""
+        waiting_queue = self.waiting_queues.get(channel_id)
+        if not waiting_queue:
+            return None
+
+        next_speaker_id = waiting_queue.popleft()
+
+        # Проверяем, что следующий не равен старому говорящему
+        if next_speaker_id == old_speaker_id:
+            logger.warning(f"⚠️ Старый говорящий {old_speaker_id} всё ещё в очереди! Пропускаем.")
+            # Берем следующего, если есть
+            next_speaker_id = waiting_queue.popleft() if waiting_queue else None
+
+        self.waiting_sets[channel_id].discard(old_speaker_id)
+        self.waiting_sets[channel_id].discard(next_speaker_id)
+        return next_speaker_id
+
+    def _remove_from_waiting(self, channel_id: int, ws_user_id: str) -> bool:
+        """Удаление пользователя из очереди ожидания; True, если он там был"""
+        waiting_set = self.waiting_sets.get(channel_id)
+        if not waiting_set or ws_user_id not in waiting_set:
+            return False
+
+        waiting_set.discard(ws_user_id)
+        self.waiting_queues[channel_id].remove(ws_user_id)
+        self._status_cache.pop(channel_id, None)
+        return True
+
+    def _rebuild_listeners(self, channel_id: int):
+        """Пересборка списка слушателей канала (все, кроме текущего говорящего)"""
+        self._status_cache.pop(channel_id, None)
+        if channel_id not in self.active_channels:
+            self.listeners.pop(channel_id, None)
             return
 
-        old_speaker_name = self.active_channels[channel_id][old_speaker_id].username
+        speaker_id = self.current_speakers.get(channel_id)
+        self.listeners[channel_id] = [
+            user for user_id, user in self.active_channels[channel_id].items() if user_id != speaker_id
+        ]
+
+    async def _notify_speaker_released(self, channel_id: int, old_speaker_name: str, reason: str,
+                                       next_speaker_id: Optional[str]):
+        """Уведомление об освобождении права говорить"""
+        now = now_iso()
 
-        # Уведомляем об освобождении
         await self._broadcast_to_channel(channel_id, {
             "type": MessageType.SPEAKER_CHANGED,
             "speaker_id": None,
@@ -281,45 +432,26 @@ class RadioConnectionManager:
             "previous_speaker": old_speaker_name,
             "channel_id": channel_id,
             "reason": reason,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now
         })
 
-        # Даем право следующему в очереди
-        if self.waiting_queues[channel_id]:
-            next_speaker_id = self.waiting_queues[channel_id].pop(0)
-
-            # Проверяем, что следующий не равен старому говорящему
-            if next_speaker_id == old_speaker_id:
-                logger.warning(f"⚠️ Старый говорящий {old_speaker_id} всё ещё в очереди! Пропускаем.")
-                # Берем следующего, если есть
-                if self.waiting_queues[channel_id]:
-                    next_speaker_id = self.waiting_queues[channel_id].pop(0)
-                else:
-                    next_speaker_id = None
-
-            if next_speaker_id:
-                self.current_speakers[channel_id] = next_speaker_id
-                self.active_channels[channel_id][next_speaker_id].is_speaking = True
-
-                next_speaker_name = self.active_channels[channel_id][next_speaker_id].username
-                logger.info(f"➡️ ТЕПЕРЬ ГОВОРИТ в канале {channel_id}: {next_speaker_name}")
-
-                # Уведомляем всех о новом говорящем
-                await self._broadcast_to_channel(channel_id, {
-                    "type": MessageType.SPEAKER_CHANGED,
-                    "speaker_id": next_speaker_id,
-                    "speaker_name": next_speaker_name,
-                    "channel_id": channel_id,
-                    "timestamp": datetime.now().isoformat()
-                })
-
-                # Уведомляем нового говорящего
-                await self._send_to_user(channel_id, next_speaker_id, {
-                    "type": MessageType.SPEAK_GRANTED,
-                    "message": "You can speak now",
-                    "channel_id": channel_id,
-                    "timestamp": datetime.now().isoformat()
-                })
+        if next_speaker_id and next_speaker_id in self.active_channels.get(channel_id, ()):
+            # Уведомляем всех о новом говорящем
+            await self._broadcast_to_channel(channel_id, {
+                "type": MessageType.SPEAKER_CHANGED,
+                "speaker_id": next_speaker_id,
+                "speaker_name": self.active_channels[channel_id][next_speaker_id].username,
+                "channel_id": channel_id,
+                "timestamp": now
+            })
+
+            # Уведомляем нового говорящего
+            await self._send_to_user(channel_id, next_speaker_id, {
+                "type": MessageType.SPEAK_GRANTED,
+                "message": "You can speak now",
+                "channel_id": channel_id,
+                "timestamp": now
+            })
 
     async def process_audio_chunk(self, ws_user_id: str, channel_id: int, audio_data: bytes):
         """Обработка аудио чанка в реальном времени"""
@@ -335,146 +467,202 @@ class RadioConnectionManager:
         # Если идет запись канала - сохраняем аудио
         await self.recorder.record_audio_chunk(channel_id, audio_data, ws_user_id, speaker_name)
 
-        # Трансляция всем остальным пользователям в канале
-        await self._broadcast_audio(channel_id, ws_user_id, audio_data)
-
-    async def _broadcast_audio(self, channel_id: int, sender_id: str, audio_data: bytes):
-        """Трансляция аудио всем в канале, кроме отправителя"""
-        if channel_id not in self.active_channels:
-            return
-
-        tasks = []
-
-        for user_id, user in self.active_channels[channel_id].items():
-            if user_id == sender_id:
-                continue
-
-            # Проверяем, нужна ли этому пользователю "подготовка" аудио
-            if not hasattr(user, 'audio_initialized'):
-                user.audio_initialized = False
-
-            if not user.audio_initialized:
-                # Отправляем 3 "тихих" пакета для инициализации аудио системы
-                silent_packet = bytes([0] * 1024)  # 1KB тишины
-
-                try:
-                    # Отправляем подготовительные пакеты
-                    for _ in range(3):
-                        await user.websocket.send_bytes(silent_packet)
-
-                    user.audio_initialized = True
-                    logger.debug(f"Отправлены подготовительные пакеты для {user.username}")
-                except Exception as e:
-                    logger.error(f"Ошибка отправки подготовительных пакетов {user.username}: {e}")
-                    continue
-
-            # Отправляем реальное аудио
+        # Трансляция всем остальным пользователям в канале - чанки за окно склейки уходят одним кадром
+        buffer = self._audio_buffers.get(channel_id)
+        if buffer is None:
+            self._audio_buffers[channel_id] = bytearray(audio_data)
+            self._audio_flush_handles[channel_id] = asyncio.get_running_loop().call_later(
+                AUDIO_COALESCE_WINDOW, self._flush_audio, channel_id)
+        else:
+            buffer += audio_data
+
+    def _flush_audio(self, channel_id: int):
+        """Отправка накопленного аудио канала одним кадром"""
+        handle = self._audio_flush_handles.pop(channel_id, None)
+        if handle:
+            handle.cancel()
+        buffer = self._audio_buffers.pop(channel_id, None)
+        if buffer:
+            self._broadcast_audio(channel_id, bytes(buffer))
+
+    def _broadcast_audio(self, channel_id: int, audio_data: bytes):
+        """Трансляция аудио всем слушателям канала"""
+        frame = (FRAME_BYTES, audio_data)
+
+        for user in self.listeners.get(channel_id, ()):
             try:
-                tasks.append(user.websocket.send_bytes(audio_data))
+                user.out_queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # Медленный клиент - выбрасываем самый старый аудио кадр, свежее аудио важнее;
+                # служебные сообщения не трогаем, а если в очереди только они - пропускаем новый пакет
+                if self._drop_queued_audio(user):
+                    user.out_queue.put_nowait(frame)
+                logger.debug(f"Очередь отправки переполнена у {user.username}, аудио кадр выброшен")
+
+    async def _writer(self, channel_id: int, user: User):
+        """Отправка кадров из очереди пользователя (одна задача на соединение)"""
+        while True:
+            kind, payload = await user.out_queue.get()
+            try:
+                if kind == FRAME_BYTES:
+                    await asyncio.wait_for(user.websocket.send_bytes(payload), SEND_TIMEOUT)
+                else:
+                    await asyncio.wait_for(user.websocket.send_text(payload), SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.error(f"Отправка пользователю {user.username} не завершилась за {SEND_TIMEOUT} сек, отключаем")
             except Exception as e:
-                logger.error(f"Ошибка отправки аудио {user.username}: {e}")
-                asyncio.create_task(self.disconnect_user(user_id, channel_id))
+                logger.error(f"Ошибка отправки пользователю {user.username}: {e}")
+            else:
+                continue
 
-        # Параллельная отправка
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
+            # Зависший или сломанный сокет закрываем сразу, не дожидаясь TCP
+            await self._close_socket(user)
+            self._schedule_disconnect(channel_id, [user.id])
+            return
 
     async def get_channel_status(self, channel_id: int) -> Optional[RadioStatus]:
         """Получение текущего статуса канала"""
-        async with self._lock:
-            if channel_id not in self.active_channels:
-                logger.error(f"Канала нет")
-                return None
+        if channel_id not in self.active_channels:
+            logger.error(f"Канала нет")
+            return None
+
+        users = self.active_channels[channel_id]
+        current_speaker = self.current_speakers.get(channel_id)
+        waiting_queue = self.waiting_queues.get(channel_id)
+        return RadioStatus(
+            channel_id=channel_id,
+            current_speaker=current_speaker,
+            current_speaker_name=users[current_speaker].username if current_speaker else None,
+            # Списки ожидающих строим только если очередь не пуста
+            waiting_queue=list(waiting_queue) if waiting_queue else [],
+            waiting_names=[users[uid].username for uid in waiting_queue] if waiting_queue else [],
+            connected_users=list(users),
+            connected_usernames=[user.username for user in users.values()],
+            total_connected=len(users),
+            server_time=datetime.now()
+        )
 
-            return RadioStatus(
-                channel_id=channel_id,
-                current_speaker=self.current_speakers[channel_id],
-                current_speaker_name=self.active_channels[channel_id][
-                    self.current_speakers[channel_id]].username if self.current_speakers[channel_id] else None,
-                waiting_queue=self.waiting_queues[channel_id].copy(),
-                waiting_names=[self.active_channels[channel_id][uid].username for uid in
-                               self.waiting_queues[channel_id]],
-                connected_users=list(self.active_channels[channel_id].keys()),
-                connected_usernames=[user.username for user in self.active_channels[channel_id].values()],
-                total_connected=len(self.active_channels[channel_id]),
-                server_time=datetime.now()
-            )
+    def _status_payload(self, status: RadioStatus) -> Dict:
+        """Статус канала в виде словаря для отправки клиенту"""
+        return {
+            "channel_id": status.channel_id,
+            "current_speaker": status.current_speaker,
+            "current_speaker_name": status.current_speaker_name,
+            "waiting_queue": status.waiting_queue,
+            "waiting_names": status.waiting_names,
+            "connected_users": status.connected_users,
+            "connected_usernames": status.connected_usernames,
+            "total_connected": status.total_connected
+        }
+
+    async def _get_status_payload(self, channel_id: int) -> Optional[Dict]:
+        """Статус канала для отправки клиентам - из кэша, если состояние канала не менялось"""
+        payload = self._status_cache.get(channel_id)
+        if payload is None:
+            status = await self.get_channel_status(channel_id)
+            if not status:
+                return None
+            payload = self._status_cache[channel_id] = self._status_payload(status)
+        return payload
 
     async def _send_status_to_user(self, channel_id: int, user_id: str):
         """Отправка статуса конкретному пользователю в канале"""
-        status = await self.get_channel_status(channel_id)
+        status = await self._get_status_payload(channel_id)
         if status:
             await self._send_to_user(channel_id, user_id, {
                 "type": MessageType.STATUS,
-                "status": {
-                    "channel_id": status.channel_id,
-                    "current_speaker": status.current_speaker,
-                    "current_speaker_name": status.current_speaker_name,
-                    "waiting_queue": status.waiting_queue,
-                    "waiting_names": status.waiting_names,
-                    "connected_users": status.connected_users,
-                    "connected_usernames": status.connected_usernames,
-                    "total_connected": status.total_connected
-                },
-                "timestamp": status.server_time.isoformat()
+                "status": status,
+                "timestamp": now_iso()
             })
 
-    async def _send_recording_status_to_user(self, channel_id: int, user_id: str):
-        """Отправка статуса конкретному пользователю в канале"""
-        status =  self.recorder.get_recording_status(channel_id)
-        if status:
-            await self._send_to_user(channel_id, user_id, {
-                "type": MessageType.RECORDING_STATUS,
-                "recording_status": status,
-            })
+    def _enqueue(self, user: User, frame: Tuple[str, str]) -> bool:
+        """Постановка служебного кадра в очередь пользователя без ожидания отправки; False - очередь полна"""
+        try:
+            user.out_queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        # Служебные сообщения важнее аудио - освобождаем место, выбросив самый старый аудио кадр
+        if self._drop_queued_audio(user):
+            user.out_queue.put_nowait(frame)
+            return True
+
+        # В очереди одни служебные сообщения - клиент не читает, его нужно отключить
+        logger.error(f"Очередь отправки переполнена у {user.username}, отключаем")
+        return False
+
+    def _drop_queued_audio(self, user: User) -> bool:
+        """Удаление самого старого аудио кадра из очереди пользователя; False - аудио в очереди нет"""
+        queue = user.out_queue
+        frames = [queue.get_nowait() for _ in range(queue.qsize())]
+        dropped = False
+        for frame in frames:
+            if not dropped and frame[0] == FRAME_BYTES:
+                dropped = True
+                continue
+            queue.put_nowait(frame)
+        return dropped
 
     async def _send_to_user(self, channel_id: int, user_id: str, message: Dict):
         """Отправка сообщения конкретному пользователю в канале"""
         if channel_id in self.active_channels and user_id in self.active_channels[channel_id]:
-            try:
-                await self.active_channels[channel_id][user_id].websocket.send_text(
-                    json.dumps(message)
-                )
-            except Exception as e:
-                logger.error(f"Ошибка отправки пользователю {user_id}: {e}")
-                asyncio.create_task(self.disconnect_user(user_id, channel_id))
+            if not self._enqueue(self.active_channels[channel_id][user_id], (FRAME_TEXT, _dumps(message))):
+                self._schedule_disconnect(channel_id, [user_id])
 
     async def _broadcast_to_channel(self, channel_id: int, message: Dict):
         """Отправка сообщения всем пользователям в канале"""
         if channel_id not in self.active_channels:
             return
 
-        json_message = json.dumps(message)
-        tasks = []
-
-        for user in self.active_channels[channel_id].values():
-            try:
-                tasks.append(user.websocket.send_text(json_message))
-            except Exception as e:
-                logger.error(f"Ошибка broadcast пользователю {user.username}: {e}")
-                asyncio.create_task(self.disconnect_user(user.id, channel_id))
+        frame = (FRAME_TEXT, _encode_broadcast(message))
 
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
+        dead = [user.id for user in self.active_channels[channel_id].values() if not self._enqueue(user, frame)]
+        if dead:
+            self._schedule_disconnect(channel_id, dead)
 
     async def _broadcast_excluding(self, channel_id: int, exclude_id: str, message: Dict):
         """Отправка сообщения всем в канале, кроме указанного пользователя"""
         if channel_id not in self.active_channels:
             return
 
-        json_message = json.dumps(message)
-        tasks = []
+        frame = (FRAME_TEXT, _encode_broadcast(message))
 
-        for user in self.active_channels[channel_id].values():
-            if user.id != exclude_id:
-                try:
-                    tasks.append(user.websocket.send_text(json_message))
-                except Exception as e:
-                    logger.error(f"Ошибка broadcast пользователю {user.username}: {e}")
-                    asyncio.create_task(self.disconnect_user(user.id, channel_id))
+        dead = [user.id for user in self.active_channels[channel_id].values()
+                if user.id != exclude_id and not self._enqueue(user, frame)]
+        if dead:
+            self._schedule_disconnect(channel_id, dead)
 
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
+    def _schedule_disconnect(self, channel_id: int, ws_user_ids: List[str]):
+        """Фоновое отключение клиентов; уже ожидающие отключения повторно не планируются"""
+        ws_user_ids = [ws_user_id for ws_user_id in ws_user_ids if ws_user_id not in self._pending_disconnect]
+        if ws_user_ids:
+            self._pending_disconnect.update(ws_user_ids)
+            asyncio.create_task(self._safe_disconnect(channel_id, ws_user_ids))
+
+    async def _safe_disconnect(self, channel_id: int, ws_user_ids: List[str]):
+        """Отключение всех не успевающих клиентов одной задачей"""
+        users = []
+        for ws_user_id in ws_user_ids:
+            try:
+                user = self.active_channels.get(channel_id, {}).get(ws_user_id)
+                await self.disconnect_user(ws_user_id, channel_id)
+                if user:
+                    users.append(user)
+            finally:
+                self._pending_disconnect.discard(ws_user_id)
+
+        # Закрываем сокеты, чтобы обработчик соединения завершился, а клиент переподключился
+        for user in users:
+            await self._close_socket(user)
+
+    async def _close_socket(self, user: User):
+        """Закрытие сокета отключенного сервером пользователя"""
+        try:
+            # Закрытие тоже ждет клиента - ограничиваем его тем же таймаутом
+            await asyncio.wait_for(user.websocket.close(code=1011), SEND_TIMEOUT)
+        except Exception as e:
+            logger.debug(f"Сокет {user.username} уже закрыт: {e}")
 
     async def start_recording(self, channel_id: int, speaker_name: str) -> Dict:
         """Начать запись эфира в канале"""
@@ -484,42 +672,35 @@ class RadioConnectionManager:
                 "message": f"Channel {channel_id} is empty or doesn't exist"
             }
 
-        await self._broadcast_to_channel(channel_id, {
-            "type": MessageType.RECORDING_STARTED,
-            "channel_id": channel_id,
-            "timestamp": datetime.now().isoformat()
-        })
-
-        result = await self.recorder.start_recording(channel_id, speaker_name)
+        async with self._recording_lock:
+            result = await self.recorder.start_recording(channel_id, speaker_name)
 
         if result["success"]:
             # Уведомляем всех в канале о начале записи
             await self._broadcast_to_channel(channel_id, {
-                "type": "recording_started",  # Добавить в MessageType
+                "type": MessageType.RECORDING_STARTED,
                 "recording_id": result["recording_id"],
                 "filename": result["filename"],
-                "timestamp": datetime.now().isoformat()
+                "channel_id": channel_id,
+                "timestamp": now_iso()
             })
 
         return result
 
     async def stop_recording(self, channel_id: int) -> Dict:
         """Остановить запись эфира в канале"""
-        result = await self.recorder.stop_recording(channel_id)
+        async with self._recording_lock:
+            result = await self.recorder.stop_recording(channel_id)
 
         if result["success"]:
-            await self._broadcast_to_channel(channel_id, {
-                "type": MessageType.RECORDING_STOPPED,
-                "channel_id": channel_id,
-                "timestamp": datetime.now().isoformat()
-            })
             # Уведомляем всех в канале об окончании записи
             await self._broadcast_to_channel(channel_id, {
-                "type": "recording_stopped",  # Добавить в MessageType
+                "type": MessageType.RECORDING_STOPPED,
                 "filename": result["filename"],
                 "filepath": result.get("filepath"),
                 "duration_seconds": result.get("duration_seconds", 0),
-                "timestamp": datetime.now().isoformat()
+                "channel_id": channel_id,
+                "timestamp": now_iso()
             })
 
         return result
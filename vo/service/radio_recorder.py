@@ -1,4 +1,5 @@
 import os
+import struct
 import uuid
 import asyncio
 import numpy as np
@@ -12,6 +13,9 @@ import pytz
 
 logger = logging.getLogger(__name__)
 
+# Заголовок WAV (RIFF + fmt + data), формат разбирается один раз при импорте
+WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+
 
 class RadioRecorder:
     """Класс для управления записью эфиров с использованием PyAV"""
@@ -20,6 +24,7 @@ class RadioRecorder:
         self.records_dir = records_dir
         self.active_recordings: Dict[int, RecordingSession] = {}
         self._ensure_records_dir()
+        self._remove_stale_parts()
 
     def _ensure_records_dir(self):
         """Создание директории для записей, если её нет"""
@@ -27,6 +32,17 @@ class RadioRecorder:
             os.makedirs(self.records_dir)
             logger.info(f"✅ Создана директория для записей: {self.records_dir}")
 
+    def _remove_stale_parts(self):
+        """Удаление незавершенных записей, оставшихся после перезапуска или падения процесса"""
+        import glob
+
+        for filepath in glob.glob(os.path.join(self.records_dir, "*.wav.part")):
+            try:
+                os.remove(filepath)
+                logger.info(f"🗑️ Удалена незавершенная запись: {filepath}")
+            except OSError as e:
+                logger.error(f"❌ Не удалось удалить {filepath}: {e}")
+
     async def start_recording(self, channel_id: int, speaker_name: str) -> Dict:
         """Начать запись эфира в канале"""
         if channel_id in self.active_recordings:
@@ -49,7 +65,7 @@ class RadioRecorder:
                 "channel_id": channel_id,
                 "recording_id": session.recording_id,
                 "filename": session.filename,
-                "start_time": session.start_time.isoformat(),
+                "start_time": session.start_time,
             }
         except Exception as e:
             logger.error(f"❌ Ошибка при старте записи: {e}")
@@ -112,7 +128,7 @@ class RadioRecorder:
             "is_recording": True,
             "recording_id": session.recording_id,
             "filename": session.filename,
-            "start_time": session.start_time.isoformat(),
+            "start_time": session.start_time,
             "duration_seconds": session.get_duration(),
             "chunks_received": session.chunks_received,
             "speakers": list(session.speakers),
@@ -120,8 +136,6 @@ class RadioRecorder:
 
     async def get_recordings_list(self, channel_id: Optional[int] = None, timezone_str: str = 'UTC') -> List[Dict]:
         """Получить список всех записей или записей для конкретного канала"""
-        import glob
-
         # Получаем целевой часовой пояс ДЛЯ ФОРМИРОВАНИЯ ИМЕНИ ФАЙЛА ПРИ ВЫВОДЕ
         try:
             target_tz = pytz.timezone(timezone_str)
@@ -134,6 +148,13 @@ class RadioRecorder:
             pattern = "channel_*.wav"
 
         search_path = os.path.join(self.records_dir, pattern)
+        # Обход директории и чтение метаданных через PyAV блокируют - выполняем в отдельном потоке
+        return await asyncio.to_thread(self._scan_recordings, search_path, target_tz, timezone_str)
+
+    def _scan_recordings(self, search_path: str, target_tz, timezone_str: str) -> List[Dict]:
+        """Сбор информации о файлах записей (синхронно)"""
+        import glob
+
         recordings = []
 
         for filepath in glob.glob(search_path):
@@ -199,8 +220,7 @@ class RecordingSession:
         self.recording_id = str(uuid.uuid4())[:8]
         self.start_time = datetime.now()
 
-        # Буфер для аудио данных
-        self.audio_buffer = bytearray()
+        self.total_bytes = 0
         self.chunks_received = 0
         self.speakers = set()  # speaker_id
         self.speaker_names = set()  # speaker_name
@@ -216,12 +236,22 @@ class RecordingSession:
         self.channels = 1
         self.sample_width = 2  # 16-bit = 2 bytes
 
+        # Аудио пишется на диск по мере поступления во временный файл с заглушкой заголовка;
+        # размеры в заголовке проставляются при финализации, затем файл переименовывается в .wav
+        self.wav_filename = self.filename.replace('.mp3', '.wav')
+        self.wav_filepath = os.path.join(records_dir, self.wav_filename)
+        self._part_filepath = self.wav_filepath + '.part'
+        self._file = open(self._part_filepath, 'wb')
+        self._file.write(self._create_wav_header(0))
+
         logger.debug(f"Создана сессия записи: {self.filename}")
 
     async def add_audio_chunk(self, audio_data: bytes, speaker_id: str, speaker_name: str = None):
-        """Добавить аудио чанк в буфер записи"""
+        """Дописать аудио чанк в файл записи"""
         async with self._lock:
-            self.audio_buffer.extend(audio_data)
+            # Файл буферизован - запись чанка не обращается к диску при каждом вызове
+            self._file.write(audio_data)
+            self.total_bytes += len(audio_data)
             self.chunks_received += 1
             self.speakers.add(speaker_id)
             if speaker_name:
@@ -229,18 +259,18 @@ class RecordingSession:
 
     def get_duration(self) -> float:
         """Примерная длительность в секундах"""
-        if not self.audio_buffer:
+        if not self.total_bytes:
             return 0.0
         # Для 16-bit моно: bytes / (sample_rate * bytes_per_sample)
         bytes_per_second = self.sample_rate * self.sample_width
-        return len(self.audio_buffer) / bytes_per_second
+        return self.total_bytes / bytes_per_second
 
     async def finalize(self) -> Dict:
         """Завершить запись и сохранить в WAV файл"""
         async with self._lock:
-            logger.info(f"ФИНАЛИЗАЦИЯ: всего байт={len(self.audio_buffer)}, чанков={self.chunks_received}")
+            logger.info(f"ФИНАЛИЗАЦИЯ: всего байт={self.total_bytes}, чанков={self.chunks_received}")
 
-            if not self.audio_buffer:
+            if not self.total_bytes:
                 return {
                     "success": False,
                     "message": "No audio data recorded",
@@ -250,15 +280,11 @@ class RecordingSession:
 
             # Сохраняем WAV
             try:
-                wav_filename = self.filename.replace('.mp3', '.wav')
-                wav_filepath = os.path.join(self.records_dir, wav_filename)
-
-                with open(wav_filepath, 'wb') as f:
-                    # Пишем правильный WAV заголовок
-                    f.write(self._create_wav_header(len(self.audio_buffer)))
-                    f.write(self.audio_buffer)
+                wav_filename = self.wav_filename
+                wav_filepath = self.wav_filepath
 
-                file_size = os.path.getsize(wav_filepath)
+                # Дозапись и переименование файла - в отдельном потоке, чтобы не блокировать event loop
+                file_size = await asyncio.to_thread(self._finish_file)
                 duration = self.get_duration()
 
                 logger.info(f"✅ WAV сохранен: {wav_filepath} ({file_size} байт, {duration:.1f} сек)")
@@ -286,6 +312,15 @@ class RecordingSession:
                     "channel_id": self.channel_id
                 }
 
+    def _finish_file(self) -> int:
+        """Проставляет размеры в WAV заголовке, закрывает и переименовывает файл; возвращает его размер"""
+        # Пишем правильный WAV заголовок поверх заглушки
+        self._file.seek(0)
+        self._file.write(self._create_wav_header(self.total_bytes))
+        self._file.close()
+        os.replace(self._part_filepath, self.wav_filepath)
+        return os.path.getsize(self.wav_filepath)
+
     def _create_wav_header(self, data_size: int) -> bytes:
         """Создает заголовок WAV файла для 16-bit PCM моно"""
         sample_rate = self.sample_rate
@@ -294,24 +329,8 @@ class RecordingSession:
         byte_rate = sample_rate * channels * bits_per_sample // 8
         block_align = channels * bits_per_sample // 8
 
-        header = bytearray()
-        # RIFF header
-        header.extend(b'RIFF')
-        header.extend((36 + data_size).to_bytes(4, 'little'))
-        header.extend(b'WAVE')
-
-        # fmt subchunk
-        header.extend(b'fmt ')
-        header.extend((16).to_bytes(4, 'little'))
-        header.extend((1).to_bytes(2, 'little'))  # PCM
-        header.extend(channels.to_bytes(2, 'little'))
-        header.extend(sample_rate.to_bytes(4, 'little'))
-        header.extend(byte_rate.to_bytes(4, 'little'))
-        header.extend(block_align.to_bytes(2, 'little'))
-        header.extend(bits_per_sample.to_bytes(2, 'little'))
-
-        # data subchunk
-        header.extend(b'data')
-        header.extend(data_size.to_bytes(4, 'little'))
-
-        return bytes(header)
\ No newline at end of file
+        return WAV_HEADER.pack(
+            b'RIFF', 36 + data_size, b'WAVE',
+            b'fmt ', 16, 1, channels, sample_rate, byte_rate, block_align, bits_per_sample,  # 1 = PCM
+            b'data', data_size
+        )
\ No newline at end of file
@@ -2,8 +2,8 @@ from datetime import datetime, timedelta
 from typing import List
 
 from dateutil.relativedelta import relativedelta
-from fastapi import Depends
-from sqlalchemy import select
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import delete, select, update
 
 from vo import tables
 from vo.database import Session, get_session
@@ -43,12 +43,21 @@ class TicketService:
         return self.session.execute(statement).scalars().first()
 
     async def give_premium(self, phone: str):
-        user = await self.get_user_by_phone(phone)
-        user.premium = datetime.now() + relativedelta(months=1)
-        self.session.commit()
-        ticket = await self.get_ticket_by_phone(phone)
-        self.session.delete(ticket)
-        self.session.commit()
+        # Выдача премиума и удаление заявки - два запроса без предварительной выборки, одной транзакцией
+        try:
+            result = self.session.execute(
+                update(tables.User)
+                .where(tables.User.phone == phone)
+                .values(premium=datetime.now() + relativedelta(months=1))
+            )
+            if result.rowcount == 0:
+                # Пользователя с таким телефоном нет - заявку не трогаем
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+            self.session.execute(delete(tables.Tickets).where(tables.Tickets.phone == phone))
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
         return await self.get_tickets()
 
     async def reject_premium(self, phone: str):
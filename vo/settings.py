@@ -4,6 +4,7 @@ class Settings(BaseSettings):
     server_host: str = '0.0.0.0'
     server_port: int = 80
     database_url: str = 'sqlite:///./database.sqlite3'
+    async_database_url: str = 'sqlite+aiosqlite:///./database.sqlite3'
 
     jwt_sercret: str = 'I8HheOD_Ue-xmEH1yo8OgxvRLUPbh7ujm2zsoHyjaM4'
     jwt_algorithm: str = 'HS256'
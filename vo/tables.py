@@ -27,7 +27,8 @@ class Participants(Base):
     __tablename__ = 'participants'
 
     user_id = sa.Column(sa.Integer, sa.ForeignKey(User.id), primary_key=True)
-    channel_id = sa.Column(sa.Integer, sa.ForeignKey(Channel.id, ondelete='CASCADE'), primary_key=True)
+    # Первичный ключ (user_id, channel_id) уже уникален; отдельный индекс - для выборок по каналу
+    channel_id = sa.Column(sa.Integer, sa.ForeignKey(Channel.id, ondelete='CASCADE'), primary_key=True, index=True)
     is_moderator = sa.Column(sa.Boolean)
     is_owner = sa.Column(sa.Boolean)
 
@@ -35,7 +36,7 @@ class BlackList(Base):
     __tablename__ = 'black_list'
 
     user_id = sa.Column(sa.Integer, sa.ForeignKey(User.id), primary_key=True)
-    channel_id = sa.Column(sa.Integer, sa.ForeignKey(Channel.id, ondelete='CASCADE'), primary_key=True)
+    channel_id = sa.Column(sa.Integer, sa.ForeignKey(Channel.id, ondelete='CASCADE'), primary_key=True, index=True)
 
 class ChatMessage(Base):
     __tablename__ = "chat"
@@ -53,5 +54,6 @@ class Tickets(Base):
 
     user_id = sa.Column(sa.Integer, sa.ForeignKey(User.id), primary_key=True)
     username = sa.Column(sa.String, nullable=False)
-    phone = sa.Column(sa.Text)
+    # Заявки выдачи/отклонения премиума ищутся по телефону
+    phone = sa.Column(sa.Text, index=True)
     image_url = sa.Column(sa.String)
\ No newline at end of file